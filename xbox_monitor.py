@@ -8,12 +8,16 @@ https://github.com/misiektoja/xbox_monitor/
 
 Python pip3 requirements:
 
-xbox-webapi
+xbox-webapi (2.1.x)
 httpx
-python-dateutil
-pytz
 tzlocal
-requests
+tzdata (only needed on Windows)
+
+Optional (used automatically if installed):
+
+uvloop
+orjson
+h2
 """
 
 VERSION = 1.5
@@ -52,6 +56,10 @@ RECEIVER_EMAIL = "your_receiver_email"
 # How often do we perform checks for player activity when user is offline, you can also use -c parameter; in seconds
 XBOX_CHECK_INTERVAL = 300  # 5 min
 
+# When user stays offline, the check interval is doubled after each check with no status change (up to the value below), you can also use -m parameter; in seconds
+# It gets back to XBOX_CHECK_INTERVAL once user changes status, set it to the same value as XBOX_CHECK_INTERVAL to disable this behavior
+XBOX_MAX_CHECK_INTERVAL = 1800  # 30 mins
+
 # How often do we perform checks for player activity when user is online, you can also use -k parameter; in seconds
 XBOX_ACTIVE_CHECK_INTERVAL = 90  # 1,5 min
 
@@ -62,9 +70,23 @@ LOCAL_TIMEZONE = 'Auto'
 # If user gets offline and online again (for example due to rebooting the console) during the next OFFLINE_INTERRUPT seconds then we set online start timestamp back to the previous one (so called short offline interruption) + we also keep stats from the previous session (like total time and number of played games)
 OFFLINE_INTERRUPT = 420  # 7 mins
 
+# Profile details (XUID, real name, location, bio) are cached in xbox_{gamertag}_profile.json file, so they are not fetched on every restart
+# How long the cached details are valid; in seconds, set it to 0 to disable caching
+XBOX_PROFILE_CACHE_TTL = 604800  # 7 days
+
 # After performing authentication the token will be saved into a file, type its location and name below
 MS_AUTH_TOKENS_FILE = "xbox_tokens.json"
 
+# Status and game change email notifications are sent after the delay below; if another change of the same kind happens within this time, the pending notification is replaced by the new one
+# It can be used to get a single email instead of several ones when user status is flapping; in seconds (0 means notifications are sent immediately)
+EMAIL_NOTIFICATION_DEBOUNCE = 0
+
+# Email notifications are sent one by one in the background; maximum number of notifications waiting to be sent, newer ones are dropped when exceeded
+EMAIL_QUEUE_SIZE = 32
+
+# Notifications still waiting in the queue or in the debounce delay when the tool is terminated are sent before exiting; maximum time spent on it, in seconds
+EMAIL_SHUTDOWN_TIMEOUT = 15
+
 # How often do we perform alive check by printing "alive check" message in the output; in seconds
 TOOL_ALIVE_INTERVAL = 21600  # 6 hours
 
@@ -74,9 +96,20 @@ CHECK_INTERNET_URL = 'http://www.google.com/'
 # Default value for initial checking of internet connectivity; in seconds
 CHECK_INTERNET_TIMEOUT = 5
 
+# CSV file entries are written via a buffer of CSV_BUFFER_SIZE bytes (you can also use --csv_buffer_bytes parameter)
+# The buffer is flushed to disk once CSV_FLUSH_ROWS entries are pending (you can also use --csv_flush_every parameter) or at the latest CSV_FLUSH_INTERVAL seconds after the first pending entry was written
+CSV_BUFFER_SIZE = 65536
+CSV_FLUSH_ROWS = 16
+CSV_FLUSH_INTERVAL = 5
+
 # The name of the .log file; the tool by default will output its messages to xbox_monitor_gamertag.log file
 XBOX_LOGFILE = "xbox_monitor"
 
+# The .log file is rotated once it grows above XBOX_LOGFILE_MAX_SIZE bytes, keeping XBOX_LOGFILE_BACKUP_COUNT old files (.log.1, .log.2 etc.)
+# Set XBOX_LOGFILE_MAX_SIZE to 0 to disable rotation (default), the log file will then grow without limit
+XBOX_LOGFILE_MAX_SIZE = 0
+XBOX_LOGFILE_BACKUP_COUNT = 3
+
 # Value used by signal handlers increasing/decreasing the check for player activity when user is online; in seconds
 XBOX_ACTIVE_CHECK_SIGNAL_VALUE = 30  # 30 seconds
 
@@ -84,23 +117,31 @@ XBOX_ACTIVE_CHECK_SIGNAL_VALUE = 30  # 30 seconds
 # CONFIGURATION SECTION END
 # -------------------------
 
-TOOL_ALIVE_COUNTER = TOOL_ALIVE_INTERVAL / XBOX_CHECK_INTERVAL
-
 stdout_bck = None
-csvfieldnames = ['Date', 'Status', 'Game name']
-
-active_inactive_notification = False
-game_change_notification = False
-status_notification = False
+LOCAL_TZ = None
+last_status_saved = {}
+# CSV header line, in the same format as the entries written by CSVWriter
+csv_header = '"Date","Status","Game name"\r\n'
+
+# Email notification flags, kept in a single bitmask which is toggled by signal handlers
+NOTIFY_ACTIVE_INACTIVE = 1
+NOTIFY_GAME_CHANGE = 2
+NOTIFY_STATUS = 4
+NOTIFY_ERRORS = 8
+notification_flags = 0
+notification_names = {NOTIFY_ACTIVE_INACTIVE: "active/inactive status changes", NOTIFY_GAME_CHANGE: "game changes", NOTIFY_STATUS: "all status changes", NOTIFY_ERRORS: "errors"}
 
 # to solve the issue: 'SyntaxError: f-string expression part cannot include a backslash'
 nl_ch = "\n"
 
+# Separator line printed after timestamps and headers, sliced to the needed length
+DASH_LINE = "-" * 256
+
 
 import sys
 
-if sys.version_info < (3, 8):
-    print("* Error: Python version 3.8 or higher required !")
+if sys.version_info < (3, 9):
+    print("* Error: Python version 3.9 or higher required !")
     sys.exit(1)
 
 import time
@@ -108,9 +149,6 @@ import string
 import json
 import os
 from datetime import datetime
-from dateutil import relativedelta
-import calendar
-import requests as req
 import signal
 import smtplib
 import ssl
@@ -118,137 +156,211 @@ from email.header import Header
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import argparse
-import csv
-import pytz
+import atexit
+import importlib.util
+from logging.handlers import RotatingFileHandler
+from functools import lru_cache
+from zoneinfo import ZoneInfo
 try:
     from tzlocal import get_localzone
 except ImportError:
     pass
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+# httpx uses h2 package for HTTP/2, it is only checked if it is installed (not imported)
+HTTP2_SUPPORTED = importlib.util.find_spec("h2") is not None
 import platform
 import re
 import ipaddress
 import asyncio
-from httpx import HTTPStatusError
+from httpx import AsyncClient, HTTPStatusError, Limits, Timeout, TransportError
+from pydantic import ValidationError
 from xbox.webapi.api.client import XboxLiveClient
 from xbox.webapi.authentication.manager import AuthenticationManager
 from xbox.webapi.authentication.models import OAuth2TokenResponse
+from xbox.webapi.common.exceptions import AuthenticationException
+from xbox.webapi.common.request_signer import RequestSigner
 from xbox.webapi.common.signed_session import SignedSession
 
+UTC_TZ = ZoneInfo("UTC")
+
+# Regexes used to validate SMTP settings before sending email notifications
+fqdn_re = re.compile(r'(?=^.{4,253}$)(^((?!-)[a-zA-Z0-9-]{1,63}(?<!-)\.)+[a-zA-Z]{2,63}\.?$)')
+email_re = re.compile(r'[^@]+@[^@]+\.[^@]+')
+
 
 # Logger class to output messages to stdout and log file
 class Logger(object):
-    def __init__(self, filename):
+    def __init__(self, filename, buffering=1, max_size=0, backup_count=0):
         self.terminal = sys.stdout
-        self.logfile = open(filename, "a", buffering=1, encoding="utf-8")
-
+        self.filename = filename
+        self.buffering = buffering
+        self.max_size = max_size
+        self.backup_count = backup_count
+        # Renaming of rotated files is left to logging's RotatingFileHandler, with delay=True it never opens the log file itself
+        self.rotating_handler = RotatingFileHandler(filename, maxBytes=max_size, backupCount=backup_count, encoding="utf-8", delay=True) if max_size and backup_count > 0 else None
+        self.logfile = open(filename, "a", buffering=buffering, encoding="utf-8")
+        # Size is tracked in characters written, which is close enough for rotation and avoids tell() on every write
+        self.logfile_size = self.logfile.tell()
+
+    # Log file is line buffered by default, with bigger buffer both outputs are flushed explicitly via flush()
     def write(self, message):
         self.terminal.write(message)
         self.logfile.write(message)
+        if self.max_size:
+            self.logfile_size += len(message)
+            if self.logfile_size >= self.max_size and message.endswith("\n"):
+                self.rotate()
+
+    # Function to rotate the log file: file.log -> file.log.1 -> file.log.2 etc., the oldest one above backup_count is overwritten
+    # Without backups the log file is truncated; the log file is always reopened, even if rotation fails (e.g. file removed by external logrotate)
+    def rotate(self):
+        try:
+            self.logfile.close()
+            if self.rotating_handler:
+                self.rotating_handler.doRollover()
+        except Exception as e:
+            self.terminal.write(f"* Cannot rotate log file '{self.filename}' - {e}\n")
+        finally:
+            try:
+                self.logfile = open(self.filename, "a" if self.rotating_handler else "w", buffering=self.buffering, encoding="utf-8")
+            except Exception as e:
+                self.terminal.write(f"* Cannot reopen log file '{self.filename}', logging to file disabled - {e}\n")
+                self.logfile = open(os.devnull, "w")
+                self.max_size = 0
+            self.logfile_size = 0
+
+    def flush(self):
         self.terminal.flush()
         self.logfile.flush()
 
-    def flush(self):
-        pass
+
+# SignedSession with explicit connection pool settings, so keep-alive connections to Xbox Live are reused across checks
+# SignedSession.__init__() calls AsyncClient.__init__() without arguments, so it is skipped and its body (setting request_signer) is repeated here;
+# this mirrors SignedSession from xbox-webapi 2.1.x (version pinned in requirements.txt), recheck it when upgrading xbox-webapi
+class XboxSignedSession(SignedSession):
+    def __init__(self, request_signer=None):
+        AsyncClient.__init__(self, limits=Limits(max_keepalive_connections=4, keepalive_expiry=300), timeout=Timeout(10.0), http2=HTTP2_SUPPORTED)
+        self.request_signer = request_signer or RequestSigner()
 
 
 # Signal handler when user presses Ctrl+C
 def signal_handler(sig, frame):
+    sys.stdout.flush()
     sys.stdout = stdout_bck
     print('\n* You pressed Ctrl+C, tool is terminated.')
     sys.exit(0)
 
 
-# Function to check internet connectivity
-def check_internet():
-    url = CHECK_INTERNET_URL
+# Function to check internet connectivity, HEAD request is enough as the response body is not needed
+async def check_internet(verbose=True):
     try:
-        _ = req.get(url, timeout=CHECK_INTERNET_TIMEOUT)
-        print("OK")
+        async with AsyncClient(timeout=CHECK_INTERNET_TIMEOUT, http2=HTTP2_SUPPORTED) as client:
+            await client.head(CHECK_INTERNET_URL)
+        if verbose:
+            print("OK")
         return True
     except Exception as e:
-        print(f"No connectivity, please check your network - {e}")
-        sys.exit(1)
-    return False
+        if verbose:
+            print(f"No connectivity, please check your network - {e}")
+        return False
 
 
-# Function to convert absolute value of seconds to human readable format
+# Function to convert absolute value of seconds to human readable format, results are cached as it is called with the same intervals over and over
+@lru_cache(maxsize=64)
 def display_time(seconds, granularity=2):
-    intervals = (
-        ('years', 31556952),  # approximation
-        ('months', 2629746),  # approximation
-        ('weeks', 604800),    # 60 * 60 * 24 * 7
-        ('days', 86400),      # 60 * 60 * 24
-        ('hours', 3600),      # 60 * 60
-        ('minutes', 60),
-        ('seconds', 1),
-    )
+    if seconds <= 0:
+        return '0 seconds'
+
+    years, remainder = divmod(seconds, 31556952)  # approximation
+    months, remainder = divmod(remainder, 2629746)  # approximation
+    weeks, remainder = divmod(remainder, 604800)  # 60 * 60 * 24 * 7
+    days, remainder = divmod(remainder, 86400)  # 60 * 60 * 24
+    hours, remainder = divmod(remainder, 3600)  # 60 * 60
+    minutes, seconds = divmod(remainder, 60)
+
     result = []
+    for name, value in (('year', years), ('month', months), ('week', weeks), ('day', days), ('hour', hours), ('minute', minutes), ('second', seconds)):
+        if value:
+            result.append(f"{value} {name}" if value == 1 else f"{value} {name}s")
+    return ', '.join(result[:granularity])
 
-    if seconds > 0:
-        for name, count in intervals:
-            value = seconds // count
-            if value:
-                seconds -= value * count
-                if value == 1:
-                    name = name.rstrip('s')
-                result.append(f"{value} {name}")
-        return ', '.join(result[:granularity])
-    else:
-        return '0 seconds'
+
+# Function to add number of months to datetime object, the day is clipped to the last day of the resulting month
+def add_months(dt, months):
+    year, month = divmod(dt.month - 1 + months, 12)
+    year += dt.year
+    month += 1
+    month_days = (datetime(year + month // 12, month % 12 + 1, 1) - datetime(year, month, 1)).days
+    return dt.replace(year=year, month=month, day=min(dt.day, month_days))
+
+
+# Function to convert timestamp (int/float) or datetime object to integer timestamp, None is returned for other types
+def to_ts(value):
+    if type(value) is int:
+        return value
+    if type(value) is float:
+        return int(round(value))
+    if type(value) is datetime:
+        return int(round(value.timestamp()))
+    return None
 
 
 # Function to calculate time span between two timestamps in seconds
 def calculate_timespan(timestamp1, timestamp2, show_weeks=True, show_hours=True, show_minutes=True, show_seconds=True, granularity=3):
     result = []
     intervals = ['years', 'months', 'weeks', 'days', 'hours', 'minutes', 'seconds']
-    ts1 = timestamp1
-    ts2 = timestamp2
-
-    if type(timestamp1) is int:
-        dt1 = datetime.fromtimestamp(int(ts1))
-    elif type(timestamp1) is float:
-        ts1 = int(round(ts1))
-        dt1 = datetime.fromtimestamp(ts1)
-    elif type(timestamp1) is datetime:
-        dt1 = timestamp1
-        ts1 = int(round(dt1.timestamp()))
-    else:
-        return ""
-
-    if type(timestamp2) is int:
-        dt2 = datetime.fromtimestamp(int(ts2))
-    elif type(timestamp2) is float:
-        ts2 = int(round(ts2))
-        dt2 = datetime.fromtimestamp(ts2)
-    elif type(timestamp2) is datetime:
-        dt2 = timestamp2
-        ts2 = int(round(dt2.timestamp()))
-    else:
+    ts1 = to_ts(timestamp1)
+    ts2 = to_ts(timestamp2)
+    if ts1 is None or ts2 is None:
         return ""
 
     if ts1 >= ts2:
         ts_diff = ts1 - ts2
     else:
         ts_diff = ts2 - ts1
-        dt1, dt2 = dt2, dt1
+        ts1, ts2 = ts2, ts1
 
     if ts_diff > 0:
-        date_diff = relativedelta.relativedelta(dt1, dt2)
-        years = date_diff.years
-        months = date_diff.months
-        weeks = date_diff.weeks
+        # Spans shorter than 4 weeks cannot contain full months, so plain arithmetic is enough there
+        if ts_diff < 86400 * 28:
+            years = 0
+            months = 0
+            days, remainder = divmod(ts_diff, 86400)
+            hours, remainder = divmod(remainder, 3600)
+            minutes, seconds = divmod(remainder, 60)
+            weeks = days // 7
+        else:
+            # Datetime objects are only needed for spans of 4 weeks and more
+            dt1 = datetime.fromtimestamp(ts1)
+            dt2 = datetime.fromtimestamp(ts2)
+            # Count whole calendar months first, the rest is plain timedelta arithmetic
+            months = (dt1.year - dt2.year) * 12 + dt1.month - dt2.month
+            dt_months = add_months(dt2, months)
+            if dt_months > dt1:
+                months -= 1
+                dt_months = add_months(dt2, months)
+            years, months = divmod(months, 12)
+            # Remainder after whole months is elapsed time (like for shorter spans), so DST changes do not add or remove an hour
+            remainder = max(ts1 - to_ts(dt_months), 0)
+            days, remainder = divmod(remainder, 86400)
+            hours, remainder = divmod(remainder, 3600)
+            minutes, seconds = divmod(remainder, 60)
+            weeks = days // 7
         if not show_weeks:
             weeks = 0
-        days = date_diff.days
         if weeks > 0:
             days = days - (weeks * 7)
-        hours = date_diff.hours
         if (not show_hours and ts_diff > 86400):
             hours = 0
-        minutes = date_diff.minutes
         if (not show_minutes and ts_diff > 3600):
             minutes = 0
-        seconds = date_diff.seconds
         if (not show_seconds and ts_diff > 60):
             seconds = 0
         date_list = [years, months, weeks, days, hours, minutes, seconds]
@@ -266,9 +378,6 @@ def calculate_timespan(timestamp1, timestamp2, show_weeks=True, show_hours=True,
 
 # Function to send email notification
 def send_email(subject, body, body_html, use_ssl, smtp_timeout=15):
-    fqdn_re = re.compile(r'(?=^.{4,253}$)(^((?!-)[a-zA-Z0-9-]{1,63}(?<!-)\.)+[a-zA-Z]{2,63}\.?$)')
-    email_re = re.compile(r'[^@]+@[^@]+\.[^@]+')
-
     try:
         is_ip = ipaddress.ip_address(str(SMTP_HOST))
     except ValueError:
@@ -300,6 +409,7 @@ def send_email(subject, body, body_html, use_ssl, smtp_timeout=15):
         print("Error sending email - SMTP settings are incorrect (body and body_html cannot be empty at the same time)")
         return 1
 
+    smtpObj = None
     try:
         if use_ssl:
             ssl_context = ssl.create_default_context()
@@ -314,43 +424,187 @@ def send_email(subject, body, body_html, use_ssl, smtp_timeout=15):
         email_msg["Subject"] = Header(subject, 'utf-8')
 
         if body:
-            part1 = MIMEText(body, 'plain')
             part1 = MIMEText(body.encode('utf-8'), 'plain', _charset='utf-8')
             email_msg.attach(part1)
 
         if body_html:
-            part2 = MIMEText(body_html, 'html')
             part2 = MIMEText(body_html.encode('utf-8'), 'html', _charset='utf-8')
             email_msg.attach(part2)
 
         smtpObj.sendmail(SENDER_EMAIL, RECEIVER_EMAIL, email_msg.as_string())
-        smtpObj.quit()
     except Exception as e:
         print(f"Error sending email - {e}")
         return 1
+    finally:
+        if smtpObj:
+            try:
+                smtpObj.quit()
+            except Exception:
+                pass
     return 0
 
 
-# Function to write CSV entry
-def write_csv_entry(csv_file_name, timestamp, status, gamename):
+# Function to send email notification from within the event loop, SMTP session runs in the default executor
+async def send_email_async(subject, body, body_html, use_ssl, smtp_timeout=15):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, send_email, subject, body, body_html, use_ssl, smtp_timeout)
+
+
+# Function to put email notification into the queue processed by email_worker(), notification is dropped if the queue is full
+def queue_email(email_queue, subject, body, body_html, use_ssl):
     try:
-        csv_file = open(csv_file_name, 'a', newline='', buffering=1, encoding="utf-8")
-        csvwriter = csv.DictWriter(csv_file, fieldnames=csvfieldnames, quoting=csv.QUOTE_NONNUMERIC)
-        csvwriter.writerow({'Date': timestamp, 'Status': status, 'Game name': gamename})
-        csv_file.close()
+        email_queue.put_nowait((subject, body, body_html, use_ssl))
+    except asyncio.QueueFull:
+        print(f"* Email notification queue is full, notification dropped: {subject}")
+
+
+# Function to queue email notification after the specified delay, so it can be cancelled and replaced by a newer one in the meantime
+async def queue_email_delayed(email_queue, email_pending, key, delay, subject, body, body_html, use_ssl):
+    if delay > 0:
+        await asyncio.sleep(delay)
+    email_pending.pop(key, None)
+    queue_email(email_queue, subject, body, body_html, use_ssl)
+
+
+# Function to schedule email notification of the given kind (key) after EMAIL_NOTIFICATION_DEBOUNCE delay, pending notification of the same kind is replaced
+# Pending notifications are kept in email_pending dictionary (key -> (task, notification)), so they can be sent on exit
+def schedule_email(email_queue, email_pending, key, subject, body, body_html, use_ssl):
+    if key in email_pending:
+        email_pending[key][0].cancel()
+        print(f"* Pending email notification replaced by a newer one: {email_pending[key][1][0]}")
+    task = asyncio.create_task(queue_email_delayed(email_queue, email_pending, key, EMAIL_NOTIFICATION_DEBOUNCE, subject, body, body_html, use_ssl))
+    email_pending[key] = (task, (subject, body, body_html, use_ssl))
+
+
+# Function to send notifications still waiting in the queue or in the debounce delay when the tool is terminated, so they are not lost
+# Sending is limited to EMAIL_SHUTDOWN_TIMEOUT seconds in total, notifications which could not be sent by then are reported
+def send_pending_emails(email_queue, email_pending):
+    notifications = []
+    while not email_queue.empty():
+        notifications.append(email_queue.get_nowait())
+        email_queue.task_done()
+    for task, notification in email_pending.values():
+        task.cancel()
+        notifications.append(notification)
+    email_pending.clear()
+
+    deadline = time.monotonic() + EMAIL_SHUTDOWN_TIMEOUT
+    for subject, body, body_html, use_ssl in notifications:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print(f"* Email notification not sent before exit: {subject}")
+            continue
+        print(f"Sending pending email notification to {RECEIVER_EMAIL} before exit")
+        send_email(subject, body, body_html, use_ssl, smtp_timeout=remaining)
+
+
+# Function (background task) sending queued email notifications one by one, so slow SMTP server does not hold up presence checks
+async def email_worker(email_queue):
+    while True:
+        subject, body, body_html, use_ssl = await email_queue.get()
+        # Message is printed when the notification is actually sent, not when it is scheduled (it might still be replaced during debounce delay)
+        print(f"Sending email notification to {RECEIVER_EMAIL}")
+        try:
+            await send_email_async(subject, body, body_html, use_ssl)
+        except Exception as e:
+            print(f"Error sending email - {e}")
+        finally:
+            email_queue.task_done()
+
+
+# Function to quote CSV field, all fields are quoted (as with csv.QUOTE_NONNUMERIC for non-numeric values)
+def csv_quote(value):
+    if value is None:
+        return '""'
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+# CSVWriter class keeping the CSV file open for the whole monitoring session
+# Entries are block buffered and flushed once flush_rows entries are pending or CSV_FLUSH_INTERVAL seconds after the first pending entry was written
+class CSVWriter(object):
+    def __init__(self, filename, buffer_size, flush_rows):
+        self.csvfile = open(filename, 'a', newline='', buffering=buffer_size, encoding="utf-8")
+        self.flush_rows = flush_rows
+        self.pending_rows = 0
+        self.flush_timer = None
+        # File opened in append mode is positioned at its end, so empty file (new or existing) gets the header
+        if self.csvfile.tell() == 0:
+            self.csvfile.write(csv_header)
+            self.flush()
+
+    # Method to write CSV entry, the line is formatted directly in the same format csv.writer with QUOTE_NONNUMERIC produces
+    def write(self, timestamp, status, gamename):
+        self.csvfile.write(f"{csv_quote(timestamp)},{csv_quote(status)},{csv_quote(gamename)}\r\n")
+        self.pending_rows += 1
+        if self.pending_rows >= self.flush_rows:
+            self.flush()
+        elif not self.flush_timer:
+            # Timer is scheduled on the event loop, so pending entries are flushed even while the main loop sleeps between checks
+            try:
+                self.flush_timer = asyncio.get_running_loop().call_later(CSV_FLUSH_INTERVAL, self.flush)
+            except RuntimeError:
+                self.flush()
+
+    def flush(self):
+        if self.flush_timer:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        self.csvfile.flush()
+        self.pending_rows = 0
+
+    # Method to flush remaining entries and make sure they hit the disk before the file is closed
+    def close(self):
+        if not self.csvfile.closed:
+            try:
+                self.flush()
+                os.fsync(self.csvfile.fileno())
+            except OSError:
+                pass
+            self.csvfile.close()
+
+
+# Function to load JSON file, orjson is used if available
+def load_json_file(filename):
+    if orjson:
+        with open(filename, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(filename, 'r', encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Function to save object to JSON file, orjson is used if available; indent=False writes compact JSON
+def save_json_file(filename, obj, indent=True):
+    if orjson:
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None))
+    else:
+        with open(filename, 'w', encoding="utf-8") as f:
+            json.dump(obj, f, indent=2 if indent else None)
+
+
+# Function to save the last status to the file; the file is replaced atomically and it is not rewritten if the content has not changed
+# Cached content is kept as (timestamp, status) tuple, as the status loaded from the file is a list
+def save_last_status(last_status_file, last_status_to_save):
+    last_status_to_save = tuple(last_status_to_save)
+    if last_status_saved.get(last_status_file) == last_status_to_save:
+        return
+    last_status_file_tmp = f"{last_status_file}.tmp"
+    try:
+        save_json_file(last_status_file_tmp, last_status_to_save, indent=False)
+        os.replace(last_status_file_tmp, last_status_file)
+        last_status_saved[last_status_file] = last_status_to_save
     except Exception as e:
-        raise
+        print(f"* Cannot save last status to '{last_status_file}' file - {e}")
 
 
 # Function to convert UTC string returned by XBOX API to datetime object in specified timezone
 def convert_utc_str_to_tz_datetime(utc_string, timezone):
     try:
-        utc_string_sanitize = utc_string.split('.', 1)[0]
-        dt_utc = datetime.strptime(utc_string_sanitize, '%Y-%m-%dT%H:%M:%S')
+        # Fractional seconds and 'Z' suffix are only supported by fromisoformat() in Python 3.11+
+        utc_string_sanitize = utc_string.split('.', 1)[0].rstrip('Z')
+        dt_utc = datetime.fromisoformat(utc_string_sanitize)
 
-        old_tz = pytz.timezone("UTC")
-        new_tz = pytz.timezone(timezone)
-        dt_new_tz = old_tz.localize(dt_utc).astimezone(new_tz)
+        dt_new_tz = dt_utc.replace(tzinfo=UTC_TZ).astimezone(timezone)
         return dt_new_tz
     except Exception as e:
         return datetime.fromtimestamp(0)
@@ -358,27 +612,29 @@ def convert_utc_str_to_tz_datetime(utc_string, timezone):
 
 # Function to return the timestamp in human readable format; eg. Sun, 21 Apr 2024, 15:08:45
 def get_cur_ts(ts_str=""):
-    return (f'{ts_str}{calendar.day_abbr[(datetime.fromtimestamp(int(time.time()))).weekday()]}, {datetime.fromtimestamp(int(time.time())).strftime("%d %b %Y, %H:%M:%S")}')
+    cur_dt = datetime.now()
+    return f'{ts_str}{cur_dt.strftime("%a, %d %b %Y, %H:%M:%S")}'
 
 
 # Function to print the current timestamp in human readable format; eg. Sun, 21 Apr 2024, 15:08:45
 def print_cur_ts(ts_str=""):
     print(get_cur_ts(str(ts_str)))
-    print("---------------------------------------------------------------------------------------------------------")
+    print(DASH_LINE[:105])
+    sys.stdout.flush()
 
 
 # Function to return the timestamp/datetime object in human readable format (long version); eg. Sun, 21 Apr 2024, 15:08:45
 def get_date_from_ts(ts):
-    if type(ts) is datetime:
-        ts_new = int(round(ts.timestamp()))
-    elif type(ts) is int:
-        ts_new = ts
-    elif type(ts) is float:
-        ts_new = int(round(ts))
-    else:
+    ts_new = to_ts(ts)
+    if ts_new is None:
         return ""
 
-    return (f'{calendar.day_abbr[(datetime.fromtimestamp(ts_new)).weekday()]} {datetime.fromtimestamp(ts_new).strftime("%d %b %Y, %H:%M:%S")}')
+    return format_date(datetime.fromtimestamp(ts_new))
+
+
+# Function to format datetime object in human readable format (long version), see get_date_from_ts()
+def format_date(dt):
+    return dt.strftime("%a %d %b %Y, %H:%M:%S")
 
 
 # Function to return the timestamp/datetime object in human readable format (short version); eg.
@@ -386,163 +642,149 @@ def get_date_from_ts(ts):
 # Sun 21 Apr 24, 15:08 (if show_year == True and current year is different)
 # Sun 21 Apr (if show_hour == False)
 def get_short_date_from_ts(ts, show_year=False, show_hour=True):
-    if type(ts) is datetime:
-        ts_new = int(round(ts.timestamp()))
-    elif type(ts) is int:
-        ts_new = ts
-    elif type(ts) is float:
-        ts_new = int(round(ts))
-    else:
+    ts_new = to_ts(ts)
+    if ts_new is None:
         return ""
 
+    return format_short_date(datetime.fromtimestamp(ts_new), show_year, show_hour)
+
+
+# Function to format datetime object in human readable format (short version), see get_short_date_from_ts()
+def format_short_date(dt, show_year=False, show_hour=True):
     if show_hour:
         hour_strftime = " %H:%M"
     else:
         hour_strftime = ""
 
-    if show_year and int(datetime.fromtimestamp(ts_new).strftime("%Y")) != int(datetime.now().strftime("%Y")):
+    if show_year and dt.year != datetime.now().year:
         if show_hour:
             hour_prefix = ","
         else:
             hour_prefix = ""
-        return (f'{calendar.day_abbr[(datetime.fromtimestamp(ts_new)).weekday()]} {datetime.fromtimestamp(ts_new).strftime(f"%d %b %y{hour_prefix}{hour_strftime}")}')
+        return dt.strftime(f"%a %d %b %y{hour_prefix}{hour_strftime}")
     else:
-        return (f'{calendar.day_abbr[(datetime.fromtimestamp(ts_new)).weekday()]} {datetime.fromtimestamp(ts_new).strftime(f"%d %b{hour_strftime}")}')
+        return dt.strftime(f"%a %d %b{hour_strftime}")
 
 
 # Function to return the timestamp/datetime object in human readable format (only hour, minutes and optionally seconds): eg. 15:08:12
 def get_hour_min_from_ts(ts, show_seconds=False):
-    if type(ts) is datetime:
-        ts_new = int(round(ts.timestamp()))
-    elif type(ts) is int:
-        ts_new = ts
-    elif type(ts) is float:
-        ts_new = int(round(ts))
-    else:
+    ts_new = to_ts(ts)
+    if ts_new is None:
         return ""
 
+    return format_hour_min(datetime.fromtimestamp(ts_new), show_seconds)
+
+
+# Function to format datetime object as hour, minutes and optionally seconds, see get_hour_min_from_ts()
+def format_hour_min(dt, show_seconds=False):
     if show_seconds:
-        out_strf = "%H:%M:%S"
-    else:
-        out_strf = "%H:%M"
-    return (str(datetime.fromtimestamp(ts_new).strftime(out_strf)))
+        return dt.strftime("%H:%M:%S")
+    return dt.strftime("%H:%M")
 
 
 # Function to return the range between two timestamps/datetime objects; eg. Sun 21 Apr 14:09 - 14:15
 def get_range_of_dates_from_tss(ts1, ts2, between_sep=" - ", short=False):
-    if type(ts1) is datetime:
-        ts1_new = int(round(ts1.timestamp()))
-    elif type(ts1) is int:
-        ts1_new = ts1
-    elif type(ts1) is float:
-        ts1_new = int(round(ts1))
-    else:
-        return ""
-
-    if type(ts2) is datetime:
-        ts2_new = int(round(ts2.timestamp()))
-    elif type(ts2) is int:
-        ts2_new = ts2
-    elif type(ts2) is float:
-        ts2_new = int(round(ts2))
-    else:
+    ts1_new = to_ts(ts1)
+    ts2_new = to_ts(ts2)
+    if ts1_new is None or ts2_new is None:
         return ""
 
-    ts1_strf = datetime.fromtimestamp(ts1_new).strftime("%Y%m%d")
-    ts2_strf = datetime.fromtimestamp(ts2_new).strftime("%Y%m%d")
+    # Both datetime objects are built once and passed to the formatting functions
+    dt1 = datetime.fromtimestamp(ts1_new)
+    dt2 = datetime.fromtimestamp(ts2_new)
 
-    if ts1_strf == ts2_strf:
+    if dt1.date() == dt2.date():
         if short:
-            out_str = f"{get_short_date_from_ts(ts1_new)}{between_sep}{get_hour_min_from_ts(ts2_new)}"
+            out_str = f"{format_short_date(dt1)}{between_sep}{format_hour_min(dt2)}"
         else:
-            out_str = f"{get_date_from_ts(ts1_new)}{between_sep}{get_hour_min_from_ts(ts2_new, show_seconds=True)}"
+            out_str = f"{format_date(dt1)}{between_sep}{format_hour_min(dt2, show_seconds=True)}"
     else:
         if short:
-            out_str = f"{get_short_date_from_ts(ts1_new)}{between_sep}{get_short_date_from_ts(ts2_new)}"
+            out_str = f"{format_short_date(dt1)}{between_sep}{format_short_date(dt2)}"
         else:
-            out_str = f"{get_date_from_ts(ts1_new)}{between_sep}{get_date_from_ts(ts2_new)}"
-    return (str(out_str))
-
-
-# Signal handler for SIGUSR1 allowing to switch active/inactive email notifications
-def toggle_active_inactive_notifications_signal_handler(sig, frame):
-    global active_inactive_notification
-    active_inactive_notification = not active_inactive_notification
-    sig_name = signal.Signals(sig).name
-    print(f"* Signal {sig_name} received")
-    print(f"* Email notifications: [active/inactive status changes = {active_inactive_notification}]")
-    print_cur_ts("Timestamp:\t\t\t")
-
-
-# Signal handler for SIGUSR2 allowing to switch played game changes notifications
-def toggle_game_change_notifications_signal_handler(sig, frame):
-    global game_change_notification
-    game_change_notification = not game_change_notification
-    sig_name = signal.Signals(sig).name
-    print(f"* Signal {sig_name} received")
-    print(f"* Email notifications: [game changes = {game_change_notification}]")
-    print_cur_ts("Timestamp:\t\t\t")
-
-
-# Signal handler for SIGCONT allowing to switch all status changes notifications
-def toggle_all_status_changes_notifications_signal_handler(sig, frame):
-    global status_notification
-    status_notification = not status_notification
-    sig_name = signal.Signals(sig).name
-    print(f"* Signal {sig_name} received")
-    print(f"* Email notifications: [all status changes = {status_notification}]")
-    print_cur_ts("Timestamp:\t\t\t")
+            out_str = f"{format_date(dt1)}{between_sep}{format_date(dt2)}"
+    return out_str
 
 
-# Signal handler for SIGTRAP allowing to increase check timer for player activity when user is online by XBOX_ACTIVE_CHECK_SIGNAL_VALUE seconds
-def increase_active_check_signal_handler(sig, frame):
-    global XBOX_ACTIVE_CHECK_INTERVAL
-    XBOX_ACTIVE_CHECK_INTERVAL = XBOX_ACTIVE_CHECK_INTERVAL + XBOX_ACTIVE_CHECK_SIGNAL_VALUE
-    sig_name = signal.Signals(sig).name
-    print(f"* Signal {sig_name} received")
-    print(f"* Xbox timers: [active check interval: {display_time(XBOX_ACTIVE_CHECK_INTERVAL)}]")
-    print_cur_ts("Timestamp:\t\t\t")
+# Function returning the name of the signal, realtime signals above SIGRTMIN are not members of signal.Signals
+def get_signal_name(sig):
+    try:
+        return signal.Signals(sig).name
+    except ValueError:
+        if hasattr(signal, "SIGRTMIN") and signal.SIGRTMIN < sig <= signal.SIGRTMAX:
+            return f"SIGRTMIN+{sig - signal.SIGRTMIN}"
+        return str(sig)
 
 
-# Signal handler for SIGABRT allowing to decrease check timer for player activity when user is online by XBOX_ACTIVE_CHECK_SIGNAL_VALUE seconds
-def decrease_active_check_signal_handler(sig, frame):
-    global XBOX_ACTIVE_CHECK_INTERVAL
-    if XBOX_ACTIVE_CHECK_INTERVAL - XBOX_ACTIVE_CHECK_SIGNAL_VALUE > 0:
-        XBOX_ACTIVE_CHECK_INTERVAL = XBOX_ACTIVE_CHECK_INTERVAL - XBOX_ACTIVE_CHECK_SIGNAL_VALUE
-    sig_name = signal.Signals(sig).name
+# Signal handler for SIGUSR1 (active/inactive), SIGUSR2 (game changes) and SIGCONT (all status changes) allowing to switch email notifications
+def toggle_notification_signal_handler(sig, flag):
+    global notification_flags
+    notification_flags ^= flag
+    sig_name = get_signal_name(sig)
     print(f"* Signal {sig_name} received")
-    print(f"* Xbox timers: [active check interval: {display_time(XBOX_ACTIVE_CHECK_INTERVAL)}]")
+    print(f"* Email notifications: [{notification_names[flag]} = {bool(notification_flags & flag)}]")
     print_cur_ts("Timestamp:\t\t\t")
 
 
-def xbox_get_platform_mapping(platform, short=True):
-    if ("scarlett" or "anaconda" or "starkville" or "lockhart" or "edith") in str(platform).lower():
-        if short:
-            platform = "XSX"
-        else:
-            platform = "Xbox One Series X/S"
-    elif ("scorpio" or "edmonton") in str(platform).lower():
-        if short:
-            platform = "XONEX"
-        else:
-            platform = "Xbox One X/S"
-    elif "durango" in str(platform).lower():
-        if short:
-            platform = "XONE"
-        else:
-            platform = "Xbox One"
-    elif "xenon" in str(platform).lower():
-        if short:
-            platform = "X360"
+# Function returning signal handler which changes check timer for player activity when user is online by delta seconds
+# Used for SIGRTMIN/SIGTRAP (increase) and SIGRTMIN+1/SIGABRT (decrease) with XBOX_ACTIVE_CHECK_SIGNAL_VALUE
+def make_active_check_signal_handler(delta):
+    def active_check_signal_handler(sig):
+        global XBOX_ACTIVE_CHECK_INTERVAL
+        sig_name = get_signal_name(sig)
+        print(f"* Signal {sig_name} received")
+        if XBOX_ACTIVE_CHECK_INTERVAL + delta > 0:
+            XBOX_ACTIVE_CHECK_INTERVAL = XBOX_ACTIVE_CHECK_INTERVAL + delta
         else:
-            platform = "Xbox 360"
-    elif "windows" in str(platform).lower():  # WindowsOneCore
-        platform = "Windows"
-    elif "ios" in str(platform).lower():
-        platform = "iPhone/iPad"
-    elif "android" in str(platform).lower():
-        if not short:
-            platform = "Android Phone/Tablet"
+            print("* Active check interval cannot be decreased any further")
+        print(f"* Xbox timers: [active check interval: {display_time(XBOX_ACTIVE_CHECK_INTERVAL)}]")
+        print_cur_ts("Timestamp:\t\t\t")
+    return active_check_signal_handler
+
+
+# Function registering signal handlers on the event loop, so they are dispatched by the loop instead of interrupting it
+# We define signal handlers only for Linux, Unix & MacOS since Windows has limited number of signals supported
+def register_signal_handlers(loop):
+    if platform.system() == 'Windows':
+        return
+    loop.add_signal_handler(signal.SIGUSR1, toggle_notification_signal_handler, signal.SIGUSR1, NOTIFY_ACTIVE_INACTIVE)
+    loop.add_signal_handler(signal.SIGUSR2, toggle_notification_signal_handler, signal.SIGUSR2, NOTIFY_GAME_CHANGE)
+    loop.add_signal_handler(signal.SIGCONT, toggle_notification_signal_handler, signal.SIGCONT, NOTIFY_STATUS)
+    # SIGTRAP and SIGABRT are always handled, so existing scripts using them keep working
+    increase_handler = make_active_check_signal_handler(XBOX_ACTIVE_CHECK_SIGNAL_VALUE)
+    decrease_handler = make_active_check_signal_handler(-XBOX_ACTIVE_CHECK_SIGNAL_VALUE)
+    loop.add_signal_handler(signal.SIGTRAP, increase_handler, signal.SIGTRAP)
+    loop.add_signal_handler(signal.SIGABRT, decrease_handler, signal.SIGABRT)
+    # Realtime signals are preferred as they are queued instead of coalesced, so quick bursts of increase/decrease requests are not lost (not available on macOS)
+    if hasattr(signal, "SIGRTMIN"):
+        loop.add_signal_handler(signal.SIGRTMIN, increase_handler, signal.SIGRTMIN)
+        loop.add_signal_handler(signal.SIGRTMIN + 1, decrease_handler, signal.SIGRTMIN + 1)
+
+
+# Platform (device type) mapping: substrings of device type -> (short name, long name); None keeps the reported device type
+xbox_platforms = (
+    (("scarlett", "anaconda", "starkville", "lockhart", "edith"), "XSX", "Xbox One Series X/S"),
+    (("scorpio", "edmonton"), "XONEX", "Xbox One X/S"),
+    (("durango",), "XONE", "Xbox One"),
+    (("xenon",), "X360", "Xbox 360"),
+    (("windows",), "Windows", "Windows"),  # WindowsOneCore
+    (("ios",), "iPhone/iPad", "iPhone/iPad"),
+    (("android",), None, "Android Phone/Tablet"),
+)
+
+
+# Title names which do not represent a game being played
+xbox_skipped_titles = frozenset(("Online", "Home", "Xbox App"))
+xbox_last_seen_skipped_titles = frozenset(("Online", "Home"))
+
+
+# Function to map device type reported by Xbox Live to human readable platform name
+def xbox_get_platform_mapping(platform, short=True):
+    platform_lower = str(platform).lower()
+    for tags, short_name, long_name in xbox_platforms:
+        if any(tag in platform_lower for tag in tags):
+            name = short_name if short else long_name
+            return name or platform
     return platform
 
 
@@ -553,53 +795,85 @@ def xbox_process_presence_class(presence, platform_short=True):
     platform = ""
     lastonline_ts = 0
 
-    if 'state' in dir(presence):
-        if presence.state:
-            status = str(presence.state).lower()
-
-    last_seen_class = ""
-
-    if 'last_seen' in dir(presence):
-        if presence.last_seen:
-            last_seen_class = presence.last_seen
-            if 'title_name' in dir(last_seen_class):
-                if last_seen_class.title_name:
-                    if last_seen_class.title_name not in ("Online", "Home"):
-                        title_name = last_seen_class.title_name
-            if 'device_type' in dir(last_seen_class):
-                if last_seen_class.device_type:
-                    platform = last_seen_class.device_type
-                    platform = xbox_get_platform_mapping(platform, platform_short)
-            if 'timestamp' in dir(last_seen_class):
-                if last_seen_class.timestamp:
-                    lastonline_dt = convert_utc_str_to_tz_datetime(str(last_seen_class.timestamp), LOCAL_TIMEZONE)
-                    lastonline_ts = int(lastonline_dt.timestamp())
-        elif 'type' in dir(presence):
-            dev_type = presence.type
-            platform = xbox_get_platform_mapping(dev_type, platform_short)
-
-    if 'devices' in dir(presence):
-        if presence.devices:
-            devices_class = presence.devices
-            try:
-                platform = devices_class[0].type
-                platform = xbox_get_platform_mapping(platform, platform_short)
-            except IndexError:
-                pass
-            if 'titles' in dir(devices_class[0]):
-                titles_class = devices_class[0].titles
-                for title in titles_class:
-                    if title.name not in ("Online", "Home", "Xbox App") and title.placement != "Background":
-                        game_name = title.name
-                        break
+    state = getattr(presence, 'state', None)
+    if state:
+        status = str(state).lower()
+
+    if hasattr(presence, 'last_seen'):
+        last_seen_class = presence.last_seen
+        if last_seen_class:
+            last_seen_title_name = getattr(last_seen_class, 'title_name', None)
+            if last_seen_title_name and last_seen_title_name not in xbox_last_seen_skipped_titles:
+                title_name = last_seen_title_name
+            last_seen_device_type = getattr(last_seen_class, 'device_type', None)
+            if last_seen_device_type:
+                platform = xbox_get_platform_mapping(last_seen_device_type, platform_short)
+            last_seen_timestamp = getattr(last_seen_class, 'timestamp', None)
+            if last_seen_timestamp:
+                lastonline_dt = convert_utc_str_to_tz_datetime(str(last_seen_timestamp), LOCAL_TZ)
+                lastonline_ts = int(lastonline_dt.timestamp())
+        else:
+            dev_type = getattr(presence, 'type', None)
+            if dev_type:
+                platform = xbox_get_platform_mapping(dev_type, platform_short)
+
+    devices_class = getattr(presence, 'devices', None)
+    if devices_class:
+        device = devices_class[0]
+        platform = xbox_get_platform_mapping(device.type, platform_short)
+        titles_class = getattr(device, 'titles', None)
+        if titles_class:
+            game_name = next((title.name for title in titles_class if title.name not in xbox_skipped_titles and title.placement != "Background"), "")
 
     return status, title_name, game_name, platform, lastonline_ts
 
 
+# Function to save OAuth tokens to the file, so the most recent (refreshed) tokens are used after restart of the tool
+def save_auth_tokens(oauth):
+    try:
+        with open(MS_AUTH_TOKENS_FILE, mode="w") as f:
+            f.write(oauth.model_dump_json())
+    except Exception as e:
+        print(f"* Cannot save tokens to '{MS_AUTH_TOKENS_FILE}' file - {e}")
+
+
+# Function checking if exception raised while getting presence is transient (network error or 5xx response), so it is worth retrying
+def xbox_is_transient_error(e):
+    if isinstance(e, HTTPStatusError):
+        return e.response.status_code >= 500
+    return isinstance(e, TransportError)
+
+
+# Function to get presence status of the user (by XUID), transient errors are retried with exponential backoff, others are raised immediately
+async def xbox_get_presence_with_retry(xbl_client, xuid, attempts=3):
+    for attempt in range(attempts):
+        try:
+            return await xbl_client.presence.get_presence(xuid, "ALL")
+        except Exception as e:
+            if attempt == attempts - 1 or not xbox_is_transient_error(e):
+                raise
+            await asyncio.sleep(2 ** attempt)
+
+
+# Function checking if exception raised while getting presence points to invalid Xbox auth tokens
+# Rejected tokens result in HTTP 401/403, while responses not matching the expected model fail pydantic validation
+def xbox_is_auth_error(e):
+    if isinstance(e, HTTPStatusError):
+        return e.response.status_code in (401, 403)
+    return isinstance(e, (AuthenticationException, ValidationError))
+
+
+# Function to sleep until the next check deadline (time.monotonic() based), time spent on the check itself is not added to the interval;
+# if we are already behind schedule (e.g. after system suspend) the deadline is reset to now, so missed checks are not replayed in a burst
+async def sleep_until_next_check(next_check_ts, interval):
+    next_check_ts = max(next_check_ts + interval, time.monotonic())
+    await asyncio.sleep(next_check_ts - time.monotonic())
+    return next_check_ts
+
+
 # Main function monitoring activity of the specified Xbox user
-async def xbox_monitor_user(xbox_gamertag, error_notification, csv_file_name, csv_exists):
+async def xbox_monitor_user(xbox_gamertag, csv_writer):
 
-    alive_counter = 0
     status_ts = 0
     status_ts_old = 0
     status_online_start_ts = 0
@@ -618,19 +892,13 @@ async def xbox_monitor_user(xbox_gamertag, error_notification, csv_file_name, cs
     game_total_ts = 0
     games_number = 0
     game_total_after_offline_counted = False
+    offline_check_interval = 0
+    error_check_interval = 0
 
-    try:
-        if csv_file_name:
-            csv_file = open(csv_file_name, 'a', newline='', buffering=1, encoding="utf-8")
-            csvwriter = csv.DictWriter(csv_file, fieldnames=csvfieldnames, quoting=csv.QUOTE_NONNUMERIC)
-            if not csv_exists:
-                csvwriter.writeheader()
-            csv_file.close()
-    except Exception as e:
-        print(f"* Error - {e}")
+    register_signal_handlers(asyncio.get_running_loop())
 
-    # Create a XBOX HTTP client session
-    async with SignedSession() as session:
+    # Create a XBOX HTTP client session, it is reused for all the requests
+    async with XboxSignedSession() as session:
 
         # Initialize with global OAUTH parameters (MS_APP_CLIENT_ID & MS_APP_CLIENT_SECRET)
         auth_mgr = AuthenticationManager(session, MS_APP_CLIENT_ID, MS_APP_CLIENT_SECRET, "")
@@ -657,44 +925,60 @@ async def xbox_monitor_user(xbox_gamertag, error_notification, csv_file_name, cs
             sys.exit(1)
 
         # Save the refreshed/updated tokens
-        with open(MS_AUTH_TOKENS_FILE, mode="w") as f:
-            f.write(auth_mgr.oauth.json())
+        save_auth_tokens(auth_mgr.oauth)
+        oauth_saved = auth_mgr.oauth
 
         # Construct the Xbox API client from AuthenticationManager instance
         xbl_client = XboxLiveClient(auth_mgr)
 
-        # Get profile for user with specified gamer tag to grab some details like XUID
-        try:
-            profile = await xbl_client.profile.get_profile_by_gamertag(xbox_gamertag)
-        except Exception as e:
-            print(f"Error - cannot get profile for user {xbox_gamertag}: {e}")
-            sys.exit(1)
+        # Try to use profile details cached in the file first, so we do not need to fetch them on every restart
+        xbox_profile_file = f"xbox_{xbox_gamertag}_profile.json"
+        if XBOX_PROFILE_CACHE_TTL > 0 and os.path.isfile(xbox_profile_file):
+            try:
+                profile_cache = load_json_file(xbox_profile_file)
+                if int(time.time()) - int(profile_cache["fetched_at"]) < XBOX_PROFILE_CACHE_TTL:
+                    xuid, realname, location, bio = int(profile_cache["xuid"]), profile_cache["realname"], profile_cache["location"], profile_cache["bio"]
+            except Exception as e:
+                print(f"* Cannot load profile from '{xbox_profile_file}' file - {e}")
 
-        if 'profile_users' in dir(profile):
+        if xuid == 0:
 
+            # Get profile for user with specified gamer tag to grab some details like XUID
             try:
-                xuid = int(profile.profile_users[0].id)
-            except IndexError:
+                profile = await xbl_client.profile.get_profile_by_gamertag(xbox_gamertag)
+            except Exception as e:
+                print(f"Error - cannot get profile for user {xbox_gamertag}: {e}")
+                sys.exit(1)
+
+            if 'profile_users' in dir(profile):
+
+                try:
+                    xuid = int(profile.profile_users[0].id)
+                except IndexError:
+                    print(f"Error - cannot get XUID for user {xbox_gamertag}")
+                    sys.exit(1)
+
+                settings = {x.id: x.value for x in profile.profile_users[0].settings}
+                location = settings.get("Location", "") or ""
+                bio = settings.get("Bio", "") or ""
+                realname = settings.get("RealNameOverride", "") or ""
+
+            if xuid == 0:
                 print(f"Error - cannot get XUID for user {xbox_gamertag}")
                 sys.exit(1)
 
-            location_tmp = next((x for x in profile.profile_users[0].settings if x.id == "Location"), None)
-            if location_tmp.value:
-                location = location_tmp.value
-            bio_tmp = next((x for x in profile.profile_users[0].settings if x.id == "Bio"), None)
-            if bio_tmp.value:
-                bio = bio_tmp.value
-            realname_tmp = next((x for x in profile.profile_users[0].settings if x.id == "RealNameOverride"), None)
-            if realname_tmp.value:
-                realname = realname_tmp.value
+            if XBOX_PROFILE_CACHE_TTL > 0:
+                profile_cache = {"gamertag": xbox_gamertag, "xuid": xuid, "realname": realname, "location": location, "bio": bio, "fetched_at": int(time.time())}
+                try:
+                    save_json_file(xbox_profile_file, profile_cache)
+                except Exception as e:
+                    print(f"* Cannot save profile to '{xbox_profile_file}' file - {e}")
 
-        if xuid == 0:
-            print(f"Error - cannot get XUID for user {xbox_gamertag}")
-            sys.exit(1)
+        xuid_str = str(xuid)
 
         # Get presence status (by XUID)
         try:
-            presence = await xbl_client.presence.get_presence(str(xuid), "ALL")
+            presence = await xbox_get_presence_with_retry(xbl_client, xuid_str)
         except Exception as e:
             print(f"Error - cannot get presence for user {xbox_gamertag}: {e}")
             sys.exit(1)
@@ -705,7 +989,9 @@ async def xbox_monitor_user(xbox_gamertag, error_notification, csv_file_name, cs
             print(f"Error - cannot get status for user {xbox_gamertag}")
             sys.exit(1)
 
-        status_ts_old = int(time.time())
+        # Startup timestamp, used for all the initial status/game/CSV entries
+        startup_ts = int(time.time())
+        status_ts_old = startup_ts
         status_ts_old_bck = status_ts_old
 
         if status and status != "offline":
@@ -719,23 +1005,18 @@ async def xbox_monitor_user(xbox_gamertag, error_notification, csv_file_name, cs
 
         if os.path.isfile(xbox_last_status_file):
             try:
-                with open(xbox_last_status_file, 'r', encoding="utf-8") as f:
-                    last_status_read = json.load(f)
+                last_status_read = load_json_file(xbox_last_status_file)
             except Exception as e:
                 print(f"* Cannot load last status from '{xbox_last_status_file}' file - {e}")
             if last_status_read:
+                last_status_saved[xbox_last_status_file] = tuple(last_status_read)
                 last_status_ts = last_status_read[0]
                 last_status = last_status_read[1]
-                xbox_last_status_file_mdate_dt = datetime.fromtimestamp(int(os.path.getmtime(xbox_last_status_file)))
-                xbox_last_status_file_mdate = xbox_last_status_file_mdate_dt.strftime("%d %b %Y, %H:%M:%S")
-                xbox_last_status_file_mdate_weekday = str(calendar.day_abbr[(xbox_last_status_file_mdate_dt).weekday()])
 
-                print(f"* Last status loaded from file '{xbox_last_status_file}' ({xbox_last_status_file_mdate_weekday} {xbox_last_status_file_mdate})")
+                print(f"* Last status loaded from file '{xbox_last_status_file}'")
 
                 if last_status_ts > 0:
-                    last_status_dt_str = datetime.fromtimestamp(last_status_ts).strftime("%d %b %Y, %H:%M:%S")
-                    last_status_ts_weekday = str(calendar.day_abbr[(datetime.fromtimestamp(last_status_ts)).weekday()])
-                    print(f"* Last status read from file: {str(last_status.upper())} ({last_status_ts_weekday} {last_status_dt_str})")
+                    print(f"* Last status read from file: {last_status.upper()} ({get_date_from_ts(last_status_ts)})")
 
                     if lastonline_ts and status == "offline":
                         if lastonline_ts >= last_status_ts:
@@ -750,14 +1031,7 @@ async def xbox_monitor_user(xbox_gamertag, error_notification, csv_file_name, cs
                         status_ts_old = last_status_ts
 
         if last_status_ts > 0 and status != last_status:
-            last_status_to_save = []
-            last_status_to_save.append(status_ts_old)
-            last_status_to_save.append(status)
-            try:
-                with open(xbox_last_status_file, 'w', encoding="utf-8") as f:
-                    json.dump(last_status_to_save, f, indent=2)
-            except Exception as e:
-                print(f"* Cannot save last status to '{xbox_last_status_file}' file - {e}")
+            save_last_status(xbox_last_status_file, (status_ts_old, status))
 
         print(f"\nXbox user gamer tag:\t\t{xbox_gamertag}")
         print(f"Xbox XUID:\t\t\t{xuid}")
@@ -768,228 +1042,268 @@ async def xbox_monitor_user(xbox_gamertag, error_notification, csv_file_name, cs
         if bio:
             print(f"Bio:\t\t\t\t{bio}")
 
-        print("\nStatus:\t\t\t\t" + str(status).upper())
+        print(f"\nStatus:\t\t\t\t{status.upper()}")
 
         if platform:
-            print("Platform:\t\t\t" + str(platform))
+            print(f"Platform:\t\t\t{platform}")
 
         if title_name and status == "offline":
             print(f"Title name:\t\t\t{title_name}")
 
         if status != "offline" and game_name:
             print(f"\nUser is currently in-game:\t{game_name}")
-            game_ts_old = int(time.time())
+            game_ts_old = startup_ts
             games_number += 1
 
         try:
-            if csv_file_name and (status != last_status):
-                write_csv_entry(csv_file_name, datetime.fromtimestamp(int(time.time())), status, game_name)
+            if csv_writer and (status != last_status):
+                csv_writer.write(datetime.fromtimestamp(startup_ts), status, game_name)
         except Exception as e:
             print(f"* Error: cannot write CSV entry - {e}")
 
         if last_status_ts == 0:
             if lastonline_ts and status == "offline":
                 status_ts_old = lastonline_ts
-            last_status_to_save = []
-            last_status_to_save.append(status_ts_old)
-            last_status_to_save.append(status)
-            try:
-                with open(xbox_last_status_file, 'w', encoding="utf-8") as f:
-                    json.dump(last_status_to_save, f, indent=2)
-            except Exception as e:
-                print(f"* Cannot save last status to '{xbox_last_status_file}' file - {e}")
+            save_last_status(xbox_last_status_file, (status_ts_old, status))
 
         if status_ts_old != status_ts_old_bck:
             if status == "offline":
-                last_status_dt_str = datetime.fromtimestamp(status_ts_old).strftime("%d %b %Y, %H:%M:%S")
-                last_status_ts_weekday = str(calendar.day_abbr[(datetime.fromtimestamp(status_ts_old)).weekday()])
-                print(f"\n* Last time user was available:\t{last_status_ts_weekday} {last_status_dt_str}")
-            print(f"\n* User is {str(status).upper()} for:\t\t{calculate_timespan(int(time.time()), int(status_ts_old), show_seconds=False)}")
+                print(f"\n* Last time user was available:\t{get_date_from_ts(status_ts_old)}")
+            print(f"\n* User is {status.upper()} for:\t\t{calculate_timespan(startup_ts, status_ts_old, show_seconds=False)}")
 
         status_old = status
         game_name_old = game_name
 
         print_cur_ts("\nTimestamp:\t\t\t")
 
-        alive_counter = 0
+        # Alive check is based on elapsed time, so it does not depend on the check interval or the offline backoff
+        last_alive_ts = time.monotonic()
         email_sent = False
+        email_pending = {}
+        # Reference to the email worker task is kept, so it is not garbage collected while running and can be stopped on exit
+        email_queue = asyncio.Queue(maxsize=EMAIL_QUEUE_SIZE)
+        email_worker_task = asyncio.create_task(email_worker(email_queue))
+        next_check_ts = time.monotonic()
 
-        # Main loop
-        while True:
-            try:
-                presence = await xbl_client.presence.get_presence(str(xuid), "ALL")
-                status, title_name, game_name, platform, lastonline_ts = xbox_process_presence_class(presence)
-                if not status:
-                    raise ValueError('Xbox user status is empty')
-                email_sent = False
-            except Exception as e:
-                if status and status != "offline":
-                    sleep_interval = XBOX_ACTIVE_CHECK_INTERVAL
-                else:
-                    sleep_interval = XBOX_CHECK_INTERVAL
-                print(f"Error getting presence, retrying in {display_time(sleep_interval)} - {e}")
-                if 'validation' in str(e) or 'auth' in str(e) or 'token' in str(e):
-                    print("* Xbox auth key might not be valid anymore!")
-                    if error_notification and not email_sent:
-                        m_subject = f"xbox_monitor: Xbox auth key error! (user: {xbox_gamertag})"
-                        m_body = f"Xbox auth key might not be valid anymore: {e}{get_cur_ts(nl_ch + nl_ch + 'Timestamp: ')}"
-                        print(f"Sending email notification to {RECEIVER_EMAIL}")
-                        send_email(m_subject, m_body, "", SMTP_SSL)
-                        email_sent = True
-                print_cur_ts("Timestamp:\t\t\t")
-                time.sleep(sleep_interval)
-                continue
-
-            change = False
-            act_inact_flag = False
-
-            status_ts = int(time.time())
-            game_ts = int(time.time())
-
-            # Player status changed
-            if status != status_old:
-
-                platform_str = ""
-                if platform:
-                    platform_str = f" ({platform})"
-
-                last_status_to_save = []
-                last_status_to_save.append(status_ts)
-                last_status_to_save.append(status)
+        # Message prefix which does not change during monitoring
+        user_prefix = f"Xbox user {xbox_gamertag}"
+
+        # Main loop, notifications not sent yet are sent when it is left (e.g. on Ctrl+C or SIGTERM)
+        try:
+            while True:
+                # Presence is polled as xbox-webapi does not support Xbox Live RTA (real-time activity) subscriptions,
+                # the number of requests is limited by backing off the check interval while the user stays offline
                 try:
-                    with open(xbox_last_status_file, 'w', encoding="utf-8") as f:
-                        json.dump(last_status_to_save, f, indent=2)
+                    presence = await xbox_get_presence_with_retry(xbl_client, xuid_str)
+                    status, title_name, game_name, platform, lastonline_ts = xbox_process_presence_class(presence)
+                    if not status:
+                        raise ValueError('Xbox user status is empty')
+                    email_sent = False
+                    error_check_interval = 0
+                    # Tokens are refreshed by the client only once they expire, save them when it happens
+                    if auth_mgr.oauth is not oauth_saved:
+                        save_auth_tokens(auth_mgr.oauth)
+                        oauth_saved = auth_mgr.oauth
                 except Exception as e:
-                    print(f"* Cannot save last status to '{xbox_last_status_file}' file - {e}")
-
-                print(f"Xbox user {xbox_gamertag} changed status from {status_old} to {status}{platform_str}")
-                print(f"User was {status_old} for {calculate_timespan(int(status_ts), int(status_ts_old))} ({get_range_of_dates_from_tss(int(status_ts_old), int(status_ts), short=True)})")
-
-                m_subject_was_since = f", was {status_old}: {get_range_of_dates_from_tss(int(status_ts_old), int(status_ts), short=True)}"
-                m_subject_after = calculate_timespan(int(status_ts), int(status_ts_old), show_seconds=False)
-                m_body_was_since = f" ({get_range_of_dates_from_tss(int(status_ts_old), int(status_ts), short=True)})"
-
-                m_body_short_offline_msg = ""
-
-                # Player got online
-                if status_old == "offline" and status and status != "offline":
-                    print(f"*** User got ACTIVE ! (was offline since {get_date_from_ts(status_ts_old)})")
-                    game_total_after_offline_counted = False
-                    if (status_ts - status_ts_old) > OFFLINE_INTERRUPT or not status_online_start_ts_old:
-                        status_online_start_ts = status_ts
-                        game_total_ts = 0
-                        games_number = 0
-                    elif (status_ts - status_ts_old) <= OFFLINE_INTERRUPT and status_online_start_ts_old > 0:
-                        status_online_start_ts = status_online_start_ts_old
-                        m_body_short_offline_msg = f"\n\nShort offline interruption ({display_time(status_ts - status_ts_old)}), online start timestamp set back to {get_short_date_from_ts(status_online_start_ts_old)}"
-                        print(f"Short offline interruption ({display_time(status_ts - status_ts_old)}), online start timestamp set back to {get_short_date_from_ts(status_online_start_ts_old)}")
-                    act_inact_flag = True
-
-                m_body_played_games = ""
-
-                # Player got offline
-                if status_old and status_old != "offline" and status == "offline":
-                    if status_online_start_ts > 0:
-                        m_subject_after = calculate_timespan(int(status_ts), int(status_online_start_ts), show_seconds=False)
-                        online_since_msg = f"(after {calculate_timespan(int(status_ts), int(status_online_start_ts), show_seconds=False)}: {get_range_of_dates_from_tss(int(status_online_start_ts), int(status_ts), short=True)})"
-                        m_subject_was_since = f", was available: {get_range_of_dates_from_tss(int(status_online_start_ts), int(status_ts), short=True)}"
-                        m_body_was_since = f" ({get_range_of_dates_from_tss(int(status_ts_old), int(status_ts), short=True)})\n\nUser was available for {calculate_timespan(int(status_ts), int(status_online_start_ts), show_seconds=False)} ({get_range_of_dates_from_tss(int(status_online_start_ts), int(status_ts), short=True)})"
+                    if status and status != "offline":
+                        sleep_interval = XBOX_ACTIVE_CHECK_INTERVAL
                     else:
-                        online_since_msg = ""
-                    if games_number > 0:
-                        if game_name_old and not game_name:
-                            game_total_ts += (int(game_ts) - int(game_ts_old))
-                            game_total_after_offline_counted = True
-                        m_body_played_games = f"\n\nUser played {games_number} games for total time of {display_time(game_total_ts)}"
-                        print(f"User played {games_number} games for total time of {display_time(game_total_ts)}")
-                    print(f"*** User got OFFLINE ! {online_since_msg}")
-                    status_online_start_ts_old = status_online_start_ts
-                    status_online_start_ts = 0
-                    act_inact_flag = True
-
-                m_body_user_in_game = ""
-                if status != "offline" and game_name:
-                    print(f"User is currently in-game: {game_name}{platform_str}")
-                    m_body_user_in_game = f"\n\nUser is currently in-game: {game_name}{platform_str}"
-
-                change = True
-
-                m_body = f"Xbox user {xbox_gamertag} changed status from {status_old} to {status}{platform_str}\n\nUser was {status_old} for {calculate_timespan(int(status_ts), int(status_ts_old))}{m_body_was_since}{m_body_short_offline_msg}{m_body_user_in_game}{m_body_played_games}{get_cur_ts(nl_ch + nl_ch + 'Timestamp: ')}"
-                if platform:
-                    platform_str = f"{platform}, "
-                m_subject = f"Xbox user {xbox_gamertag} is now {status} ({platform_str}after {m_subject_after}{m_subject_was_since})"
-                if status_notification or (active_inactive_notification and act_inact_flag):
-                    print(f"Sending email notification to {RECEIVER_EMAIL}")
-                    send_email(m_subject, m_body, "", SMTP_SSL)
-
-                status_ts_old = status_ts
-                print_cur_ts("Timestamp:\t\t\t")
-
-            # Player started/stopped/changed the game
-            if game_name != game_name_old:
-
-                platform_str = ""
-                if platform:
-                    platform_str = f" ({platform})"
-
-                # User changed the game
-                if game_name_old and game_name:
-                    print(f"Xbox user {xbox_gamertag} changed game from '{game_name_old}' to '{game_name}'{platform_str} after {calculate_timespan(int(game_ts), int(game_ts_old))}")
-                    print(f"User played game from {get_range_of_dates_from_tss(int(game_ts_old), int(game_ts), short=True, between_sep=' to ')}")
-                    game_total_ts += (int(game_ts) - int(game_ts_old))
-                    games_number += 1
-                    m_body = f"Xbox user {xbox_gamertag} changed game from '{game_name_old}' to '{game_name}'{platform_str} after {calculate_timespan(int(game_ts), int(game_ts_old))}\n\nUser played game from {get_range_of_dates_from_tss(int(game_ts_old), int(game_ts), short=True, between_sep=' to ')}{get_cur_ts(nl_ch + nl_ch + 'Timestamp: ')}"
+                        sleep_interval = XBOX_CHECK_INTERVAL
+                    # If network errors are caused by our own connectivity being down, back off exponentially up to XBOX_MAX_CHECK_INTERVAL instead of hammering Xbox API
+                    if isinstance(e, TransportError) and not await check_internet(verbose=False):
+                        if error_check_interval:
+                            error_check_interval = min(error_check_interval * 2, max(XBOX_MAX_CHECK_INTERVAL, sleep_interval))
+                        else:
+                            error_check_interval = sleep_interval
+                        sleep_interval = error_check_interval
+                        print("* No internet connectivity, please check your network")
+                    print(f"Error getting presence, retrying in {display_time(sleep_interval)} - {e}")
+                    if xbox_is_auth_error(e):
+                        print("* Xbox auth key might not be valid anymore!")
+                        if notification_flags & NOTIFY_ERRORS and not email_sent:
+                            m_subject = f"xbox_monitor: Xbox auth key error! (user: {xbox_gamertag})"
+                            m_body = f"Xbox auth key might not be valid anymore: {e}{get_cur_ts(nl_ch + nl_ch + 'Timestamp: ')}"
+                            queue_email(email_queue, m_subject, m_body, "", SMTP_SSL)
+                            email_sent = True
+                    print_cur_ts("Timestamp:\t\t\t")
+                    next_check_ts = await sleep_until_next_check(next_check_ts, sleep_interval)
+                    continue
+
+                change = False
+                act_inact_flag = False
+
+                # Status and game changes detected in the same check share one timestamp, so their durations add up consistently
+                status_ts = int(time.time())
+                game_ts = status_ts
+
+                # Player status changed
+                if status != status_old:
+
+                    platform_str = ""
                     if platform:
-                        platform_str = f"{platform}, "
-                    m_subject = f"Xbox user {xbox_gamertag} changed game to '{game_name}' ({platform_str}after {calculate_timespan(int(game_ts), int(game_ts_old), show_seconds=False)}: {get_range_of_dates_from_tss(int(game_ts_old), int(game_ts), short=True)})"
-
-                # User started playing new game
-                elif not game_name_old and game_name:
-                    print(f"Xbox user {xbox_gamertag} started playing '{game_name}'{platform_str}")
-                    games_number += 1
-                    m_subject = f"Xbox user {xbox_gamertag} now plays '{game_name}'{platform_str}"
-                    m_body = f"Xbox user {xbox_gamertag} now plays '{game_name}'{platform_str}{get_cur_ts(nl_ch + nl_ch + 'Timestamp: ')}"
-
-                # User stopped playing the game
-                elif game_name_old and not game_name:
-                    print(f"Xbox user {xbox_gamertag} stopped playing '{game_name_old}' after {calculate_timespan(int(game_ts), int(game_ts_old))}")
-                    print(f"User played game from {get_range_of_dates_from_tss(int(game_ts_old), int(game_ts), short=True, between_sep=' to ')}")
-                    if not game_total_after_offline_counted:
-                        game_total_ts += (int(game_ts) - int(game_ts_old))
-                    m_subject = f"Xbox user {xbox_gamertag} stopped playing '{game_name_old}' (after {calculate_timespan(int(game_ts), int(game_ts_old), show_seconds=False)}: {get_range_of_dates_from_tss(int(game_ts_old), int(game_ts), short=True)})"
-                    m_body = f"Xbox user {xbox_gamertag} stopped playing '{game_name_old}' after {calculate_timespan(int(game_ts), int(game_ts_old))}\n\nUser played game from {get_range_of_dates_from_tss(int(game_ts_old), int(game_ts), short=True, between_sep=' to ')}{get_cur_ts(nl_ch + nl_ch + 'Timestamp: ')}"
+                        platform_str = f" ({platform})"
+
+                    save_last_status(xbox_last_status_file, (status_ts, status))
+
+                    # Time span and range of the previous status are used by several messages below, so they are computed once
+                    status_span = calculate_timespan(status_ts, status_ts_old)
+                    status_range = get_range_of_dates_from_tss(status_ts_old, status_ts, short=True)
+
+                    print(f"{user_prefix} changed status from {status_old} to {status}{platform_str}")
+                    print(f"User was {status_old} for {status_span} ({status_range})")
+
+                    m_subject_was_since = f", was {status_old}: {status_range}"
+                    m_subject_after = calculate_timespan(status_ts, status_ts_old, show_seconds=False)
+                    m_body_was_since = f" ({status_range})"
+
+                    m_body_short_offline_msg = ""
+
+                    # Player got online
+                    if status_old == "offline" and status and status != "offline":
+                        print(f"*** User got ACTIVE ! (was offline since {get_date_from_ts(status_ts_old)})")
+                        game_total_after_offline_counted = False
+                        if (status_ts - status_ts_old) > OFFLINE_INTERRUPT or not status_online_start_ts_old:
+                            status_online_start_ts = status_ts
+                            game_total_ts = 0
+                            games_number = 0
+                        elif (status_ts - status_ts_old) <= OFFLINE_INTERRUPT and status_online_start_ts_old > 0:
+                            status_online_start_ts = status_online_start_ts_old
+                            short_offline_msg = f"Short offline interruption ({display_time(status_ts - status_ts_old)}), online start timestamp set back to {get_short_date_from_ts(status_online_start_ts_old)}"
+                            m_body_short_offline_msg = f"\n\n{short_offline_msg}"
+                            print(short_offline_msg)
+                        act_inact_flag = True
+
+                    m_body_played_games = ""
+
+                    # Player got offline
+                    if status_old and status_old != "offline" and status == "offline":
+                        if status_online_start_ts > 0:
+                            online_span = calculate_timespan(status_ts, status_online_start_ts, show_seconds=False)
+                            online_range = get_range_of_dates_from_tss(status_online_start_ts, status_ts, short=True)
+                            m_subject_after = online_span
+                            online_since_msg = f"(after {online_span}: {online_range})"
+                            m_subject_was_since = f", was available: {online_range}"
+                            m_body_was_since = f" ({status_range})\n\nUser was available for {online_span} ({online_range})"
+                        else:
+                            online_since_msg = ""
+                        if games_number > 0:
+                            if game_name_old and not game_name:
+                                game_total_ts += (game_ts - game_ts_old)
+                                game_total_after_offline_counted = True
+                            played_games_msg = f"User played {games_number} games for total time of {display_time(game_total_ts)}"
+                            m_body_played_games = f"\n\n{played_games_msg}"
+                            print(played_games_msg)
+                        print(f"*** User got OFFLINE ! {online_since_msg}")
+                        status_online_start_ts_old = status_online_start_ts
+                        status_online_start_ts = 0
+                        act_inact_flag = True
 
-                change = True
+                    m_body_user_in_game = ""
+                    if status != "offline" and game_name:
+                        user_in_game_msg = f"User is currently in-game: {game_name}{platform_str}"
+                        m_body_user_in_game = f"\n\n{user_in_game_msg}"
+                        print(user_in_game_msg)
 
-                if game_change_notification:
-                    print(f"Sending email notification to {RECEIVER_EMAIL}")
-                    send_email(m_subject, m_body, "", SMTP_SSL)
+                    change = True
 
-                game_ts_old = game_ts
-                print_cur_ts("Timestamp:\t\t\t")
+                    # Email subject and body are only built when the notification is actually going to be sent
+                    if notification_flags & NOTIFY_STATUS or (notification_flags & NOTIFY_ACTIVE_INACTIVE and act_inact_flag):
+                        m_body = f"{user_prefix} changed status from {status_old} to {status}{platform_str}\n\nUser was {status_old} for {status_span}{m_body_was_since}{m_body_short_offline_msg}{m_body_user_in_game}{m_body_played_games}{get_cur_ts(nl_ch + nl_ch + 'Timestamp: ')}"
+                        if platform:
+                            platform_str = f"{platform}, "
+                        m_subject = f"{user_prefix} is now {status} ({platform_str}after {m_subject_after}{m_subject_was_since})"
+                        schedule_email(email_queue, email_pending, "status", m_subject, m_body, "", SMTP_SSL)
 
-            if change:
-                alive_counter = 0
+                    status_ts_old = status_ts
+                    print_cur_ts("Timestamp:\t\t\t")
 
-                try:
-                    if csv_file_name:
-                        write_csv_entry(csv_file_name, datetime.fromtimestamp(int(time.time())), status, game_name)
-                except Exception as e:
-                    print(f"* Error: cannot write CSV entry - {e}")
+                # Player started/stopped/changed the game
+                if game_name != game_name_old:
 
-            status_old = status
-            game_name_old = game_name
+                    platform_str = ""
+                    if platform:
+                        platform_str = f" ({platform})"
+
+                    # Email subject and body are only built when the notification is actually going to be sent
+                    game_notify = notification_flags & NOTIFY_GAME_CHANGE
+
+                    # User changed the game
+                    # Time span and range of the previous game are used by several messages below, so they are computed once
+                    if game_name_old:
+                        game_span = calculate_timespan(game_ts, game_ts_old)
+                        game_range = get_range_of_dates_from_tss(game_ts_old, game_ts, short=True, between_sep=' to ')
+
+                    if game_name_old and game_name:
+                        game_changed_msg = f"{user_prefix} changed game from '{game_name_old}' to '{game_name}'{platform_str} after {game_span}"
+                        print(game_changed_msg)
+                        print(f"User played game from {game_range}")
+                        game_total_ts += (game_ts - game_ts_old)
+                        games_number += 1
+                        if game_notify:
+                            m_body = f"{game_changed_msg}\n\nUser played game from {game_range}{get_cur_ts(nl_ch + nl_ch + 'Timestamp: ')}"
+                            if platform:
+                                platform_str = f"{platform}, "
+                            m_subject = f"{user_prefix} changed game to '{game_name}' ({platform_str}after {calculate_timespan(game_ts, game_ts_old, show_seconds=False)}: {get_range_of_dates_from_tss(game_ts_old, game_ts, short=True)})"
+
+                    # User started playing new game
+                    elif not game_name_old and game_name:
+                        print(f"{user_prefix} started playing '{game_name}'{platform_str}")
+                        games_number += 1
+                        if game_notify:
+                            m_subject = f"{user_prefix} now plays '{game_name}'{platform_str}"
+                            m_body = f"{m_subject}{get_cur_ts(nl_ch + nl_ch + 'Timestamp: ')}"
+
+                    # User stopped playing the game
+                    elif game_name_old and not game_name:
+                        game_stopped_msg = f"{user_prefix} stopped playing '{game_name_old}' after {game_span}"
+                        print(game_stopped_msg)
+                        print(f"User played game from {game_range}")
+                        if not game_total_after_offline_counted:
+                            game_total_ts += (game_ts - game_ts_old)
+                        if game_notify:
+                            m_subject = f"{user_prefix} stopped playing '{game_name_old}' (after {calculate_timespan(game_ts, game_ts_old, show_seconds=False)}: {get_range_of_dates_from_tss(game_ts_old, game_ts, short=True)})"
+                            m_body = f"{game_stopped_msg}\n\nUser played game from {game_range}{get_cur_ts(nl_ch + nl_ch + 'Timestamp: ')}"
+
+                    change = True
+
+                    if game_notify:
+                        schedule_email(email_queue, email_pending, "game", m_subject, m_body, "", SMTP_SSL)
+
+                    game_ts_old = game_ts
+                    print_cur_ts("Timestamp:\t\t\t")
+
+                if change:
+                    last_alive_ts = time.monotonic()
+
+                    try:
+                        if csv_writer:
+                            csv_writer.write(datetime.fromtimestamp(status_ts), status, game_name)
+                    except Exception as e:
+                        print(f"* Error: cannot write CSV entry - {e}")
+
+                status_old = status
+                game_name_old = game_name
+
+                if time.monotonic() - last_alive_ts >= TOOL_ALIVE_INTERVAL and (status == "offline" or not status):
+                    print_cur_ts("Alive check, timestamp:\t\t")
+                    last_alive_ts = time.monotonic()
 
-            alive_counter += 1
+                if status and status != "offline":
+                    offline_check_interval = 0
+                    sleep_interval = XBOX_ACTIVE_CHECK_INTERVAL
+                else:
+                    # Back off exponentially while user stays offline, up to XBOX_MAX_CHECK_INTERVAL
+                    if change or not offline_check_interval:
+                        offline_check_interval = XBOX_CHECK_INTERVAL
+                    else:
+                        offline_check_interval = min(offline_check_interval * 2, max(XBOX_MAX_CHECK_INTERVAL, XBOX_CHECK_INTERVAL))
+                    sleep_interval = offline_check_interval
 
-            if alive_counter >= TOOL_ALIVE_COUNTER and (status == "offline" or not status):
-                print_cur_ts("Alive check, timestamp:\t\t")
-                alive_counter = 0
+                next_check_ts = await sleep_until_next_check(next_check_ts, sleep_interval)
+        finally:
+            email_worker_task.cancel()
+            send_pending_emails(email_queue, email_pending)
 
-            if status and status != "offline":
-                time.sleep(XBOX_ACTIVE_CHECK_INTERVAL)
-            else:
-                time.sleep(XBOX_CHECK_INTERVAL)
 
 if __name__ == "__main__":
 
@@ -998,11 +1312,12 @@ if __name__ == "__main__":
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
+    # Screen is cleared with ANSI escape codes, no need to spawn a shell; only legacy Windows console (outside Windows Terminal) does not support them by default
     try:
-        if platform.system() == 'Windows':
+        if platform.system() == 'Windows' and not os.environ.get('WT_SESSION'):
             os.system('cls')
         else:
-            os.system('clear')
+            print("\033[2J\033[H", end="")
     except:
         print("* Cannot clear the screen contents")
 
@@ -1018,7 +1333,10 @@ if __name__ == "__main__":
     parser.add_argument("-e", "--error_notification", help="Disable sending email notifications in case of errors like oauth issues", action='store_false')
     parser.add_argument("-c", "--check_interval", help="Time between monitoring checks if user is offline, in seconds", type=int)
     parser.add_argument("-k", "--active_check_interval", help="Time between monitoring checks if user is NOT offline, in seconds", type=int)
+    parser.add_argument("-m", "--max_check_interval", help="Maximum time between monitoring checks if user stays offline (check interval is doubled after each check with no status change), in seconds", type=int)
     parser.add_argument("-b", "--csv_file", help="Write all status & game changes to CSV file", type=str, metavar="CSV_FILENAME")
+    parser.add_argument("--csv_buffer_bytes", help="Size of the buffer used for writing to CSV file, in bytes", type=int, metavar="BYTES")
+    parser.add_argument("--csv_flush_every", help="Flush CSV file to disk after the specified number of entries", type=int, metavar="ENTRIES")
     parser.add_argument("-d", "--disable_logging", help="Disable logging to file 'xbox_monitor_user.log' file", action='store_true')
     parser.add_argument("-z", "--send_test_email_notification", help="Send test email notification to verify SMTP settings defined in the script", action='store_true')
     args = parser.parse_args()
@@ -1039,9 +1357,16 @@ if __name__ == "__main__":
             print("* Error: Cannot detect local timezone, consider setting LOCAL_TIMEZONE to your local timezone manually !")
             sys.exit(1)
 
+    try:
+        LOCAL_TZ = ZoneInfo(LOCAL_TIMEZONE)
+    except Exception:
+        print(f"* Error: Unknown timezone '{LOCAL_TIMEZONE}', check LOCAL_TIMEZONE value !")
+        sys.exit(1)
+
     sys.stdout.write("* Checking internet connectivity ... ")
     sys.stdout.flush()
-    check_internet()
+    if not asyncio.run(check_internet()):
+        sys.exit(1)
     print("")
 
     if args.send_test_email_notification:
@@ -1070,60 +1395,94 @@ if __name__ == "__main__":
         print("* Error: MS_APP_CLIENT_SECRET (-w / --ms_app_client_secret) value is empty or incorrect")
         sys.exit(1)
 
-    if args.check_interval:
+    if args.check_interval is not None:
+        if args.check_interval < 1:
+            print("* Error: -c / --check_interval value must be greater than 0")
+            sys.exit(1)
         XBOX_CHECK_INTERVAL = args.check_interval
-        TOOL_ALIVE_COUNTER = TOOL_ALIVE_INTERVAL / XBOX_CHECK_INTERVAL
 
-    if args.active_check_interval:
+    if args.active_check_interval is not None:
+        if args.active_check_interval < 1:
+            print("* Error: -k / --active_check_interval value must be greater than 0")
+            sys.exit(1)
         XBOX_ACTIVE_CHECK_INTERVAL = args.active_check_interval
 
+    if args.max_check_interval is not None:
+        if args.max_check_interval < 1:
+            print("* Error: -m / --max_check_interval value must be greater than 0")
+            sys.exit(1)
+        XBOX_MAX_CHECK_INTERVAL = args.max_check_interval
+
+    # Buffer size of 1 would make open() switch to line buffering, so it is rejected as well
+    if args.csv_buffer_bytes is not None:
+        if args.csv_buffer_bytes <= 1:
+            print("* Error: --csv_buffer_bytes value must be greater than 1")
+            sys.exit(1)
+        CSV_BUFFER_SIZE = args.csv_buffer_bytes
+
+    if args.csv_flush_every is not None:
+        if args.csv_flush_every < 1:
+            print("* Error: --csv_flush_every value must be greater than 0")
+            sys.exit(1)
+        CSV_FLUSH_ROWS = args.csv_flush_every
+
     if args.csv_file:
         csv_enabled = True
-        csv_exists = os.path.isfile(args.csv_file)
         try:
-            csv_file = open(args.csv_file, 'a', newline='', buffering=1, encoding="utf-8")
+            csv_writer = CSVWriter(args.csv_file, CSV_BUFFER_SIZE, CSV_FLUSH_ROWS)
         except Exception as e:
             print(f"* Error: CSV file cannot be opened for writing - {e}")
             sys.exit(1)
-        csv_file.close()
+        atexit.register(csv_writer.close)
     else:
         csv_enabled = False
-        csv_file = None
-        csv_exists = False
+        csv_writer = None
 
     if not args.disable_logging:
         XBOX_LOGFILE = f"{XBOX_LOGFILE}_{args.XBOX_GAMERTAG}.log"
-        sys.stdout = Logger(XBOX_LOGFILE)
+        # Log file is block buffered, it gets flushed after each timestamp line (see print_cur_ts()) and on exit
+        sys.stdout = Logger(XBOX_LOGFILE, buffering=8192, max_size=XBOX_LOGFILE_MAX_SIZE, backup_count=XBOX_LOGFILE_BACKUP_COUNT)
 
-    active_inactive_notification = args.active_inactive_notification
-    game_change_notification = args.game_change_notification
-    status_notification = args.status_notification
+    notification_flags = (NOTIFY_ACTIVE_INACTIVE if args.active_inactive_notification else 0) | (NOTIFY_GAME_CHANGE if args.game_change_notification else 0) | (NOTIFY_STATUS if args.status_notification else 0) | (NOTIFY_ERRORS if args.error_notification else 0)
 
-    print(f"* Xbox timers:\t\t\t[check interval: {display_time(XBOX_CHECK_INTERVAL)}] [active check interval: {display_time(XBOX_ACTIVE_CHECK_INTERVAL)}]")
-    print(f"* Email notifications:\t\t[active/inactive status changes = {active_inactive_notification}] [game changes = {game_change_notification}]\n*\t\t\t\t[all status changes = {status_notification}] [errors = {args.error_notification}]")
+    # Startup banner is collected and written out at once
+    banner_lines = [f"* Xbox timers:\t\t\t[check interval: {display_time(XBOX_CHECK_INTERVAL)}] [active check interval: {display_time(XBOX_ACTIVE_CHECK_INTERVAL)}]"]
+    if XBOX_MAX_CHECK_INTERVAL > XBOX_CHECK_INTERVAL:
+        banner_lines.append(f"*\t\t\t\t[max check interval: {display_time(XBOX_MAX_CHECK_INTERVAL)}]")
+    banner_lines.append(f"* Email notifications:\t\t[active/inactive status changes = {bool(notification_flags & NOTIFY_ACTIVE_INACTIVE)}] [game changes = {bool(notification_flags & NOTIFY_GAME_CHANGE)}]\n*\t\t\t\t[all status changes = {bool(notification_flags & NOTIFY_STATUS)}] [errors = {bool(notification_flags & NOTIFY_ERRORS)}]")
     if not args.disable_logging:
-        print(f"* Output logging enabled:\t{not args.disable_logging} ({XBOX_LOGFILE})")
+        banner_lines.append(f"* Output logging enabled:\t{not args.disable_logging} ({XBOX_LOGFILE})")
     else:
-        print(f"* Output logging enabled:\t{not args.disable_logging}")
+        banner_lines.append(f"* Output logging enabled:\t{not args.disable_logging}")
     if csv_enabled:
-        print(f"* CSV logging enabled:\t\t{csv_enabled} ({args.csv_file})")
+        banner_lines.append(f"* CSV logging enabled:\t\t{csv_enabled} ({args.csv_file})")
     else:
-        print(f"* CSV logging enabled:\t\t{csv_enabled}")
-    print(f"* Local timezone:\t\t{LOCAL_TIMEZONE}")
+        banner_lines.append(f"* CSV logging enabled:\t\t{csv_enabled}")
+    banner_lines.append(f"* Local timezone:\t\t{LOCAL_TIMEZONE}")
 
     out = f"\nMonitoring user with Xbox gamer tag {args.XBOX_GAMERTAG}"
-    print(out)
-    print("-" * len(out))
-
-    # We define signal handlers only for Linux, Unix & MacOS since Windows has limited number of signals supported
-    if platform.system() != 'Windows':
-        signal.signal(signal.SIGUSR1, toggle_active_inactive_notifications_signal_handler)
-        signal.signal(signal.SIGUSR2, toggle_game_change_notifications_signal_handler)
-        signal.signal(signal.SIGCONT, toggle_all_status_changes_notifications_signal_handler)
-        signal.signal(signal.SIGTRAP, increase_active_check_signal_handler)
-        signal.signal(signal.SIGABRT, decrease_active_check_signal_handler)
-
-    asyncio.run(xbox_monitor_user(args.XBOX_GAMERTAG, args.error_notification, args.csv_file, csv_exists))
+    banner_lines.append(out)
+    banner_lines.append(DASH_LINE[:len(out)])
+    sys.stdout.write("\n".join(banner_lines) + "\n")
+
+    # Use uvloop based event loop if available
+    loop_factory = uvloop.new_event_loop if uvloop else asyncio.new_event_loop
+
+    try:
+        # asyncio.Runner is available since Python 3.11
+        if hasattr(asyncio, "Runner"):
+            with asyncio.Runner(loop_factory=loop_factory) as runner:
+                runner.run(xbox_monitor_user(args.XBOX_GAMERTAG, csv_writer))
+        else:
+            if uvloop:
+                asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            asyncio.run(xbox_monitor_user(args.XBOX_GAMERTAG, csv_writer))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sys.stdout.flush()
+        if csv_writer:
+            csv_writer.close()
 
     sys.stdout = stdout_bck
     sys.exit(0)